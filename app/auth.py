@@ -1,26 +1,51 @@
 # app/auth.py
 
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
+from cachetools import TLRUCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from sqlalchemy.orm import joinedload
+from jose import JWTError, jwk, jwt
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import settings
 from .database import get_session
 from .models import User
 
-# Argon2 password hasher
-ph = PasswordHasher()
+# Argon2 password hasher (may be replaced by calibrate_password_hasher at startup)
+ph = PasswordHasher(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST,
+    parallelism=settings.ARGON2_PARALLELISM,
+)
+
+# Set once calibrate_password_hasher has run (inherited by forked workers)
+_calibrated = False
+
+# HMAC key object built once; passing a Key skips jose's per-call key parsing
+SIGNING_KEY = jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
 
 # OAuth2 scheme - points to login endpoint
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
 
 
+def _token_ttu(_token: str, value: Tuple[int, float], now: float) -> float:
+    """Cache entries live for TOKEN_CACHE_TTL_SECONDS, but never past the token's exp"""
+    _, exp = value
+    return now + min(settings.TOKEN_CACHE_TTL_SECONDS, exp - time.time())
+
+
+# Verified bearer token -> (user_id, exp). Only touched from the event loop between
+# awaits, so no lock is needed. Failures are never cached.
+_token_cache: TLRUCache = TLRUCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttu=_token_ttu)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash using Argon2"""
     try:
@@ -35,6 +60,40 @@ def get_password_hash(password: str) -> str:
     return ph.hash(password)
 
 
+def calibrate_password_hasher() -> PasswordHasher:
+    """
+    Raise Argon2 memory_cost until a single hash takes ~ARGON2_TARGET_MS.
+    Never goes below the configured cost; existing hashes keep verifying
+    because their parameters are encoded in the hash string.
+    Runs once per process tree: under Gunicorn the master calibrates before
+    forking and workers inherit the result.
+    """
+    global ph, _calibrated
+    if _calibrated:
+        return ph
+    memory_cost = settings.ARGON2_MEMORY_COST
+    target = settings.ARGON2_TARGET_MS / 1000
+
+    while True:
+        hasher = PasswordHasher(
+            time_cost=settings.ARGON2_TIME_COST,
+            memory_cost=memory_cost,
+            parallelism=settings.ARGON2_PARALLELISM,
+        )
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        elapsed = time.perf_counter() - start
+
+        next_cost = memory_cost * 2
+        if elapsed >= target or next_cost > settings.ARGON2_MAX_MEMORY_COST:
+            break
+        memory_cost = next_cost
+
+    ph = hasher
+    _calibrated = True
+    return ph
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -42,17 +101,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ) -> User:
     """
     Dependency that extracts and validates the current user from JWT token.
     Use this in any endpoint that requires authentication.
+    Recently verified tokens skip JWT verification; the user (and profile)
+    is always loaded fresh so account and profile changes apply immediately.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,17 +121,25 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    # The profile is loaded too since chat needs it every turn
+    statement = select(User).options(joinedload(User.profile))
+    
+    cached = _token_cache.get(token)
+    if cached is not None:
+        # Primary-key lookup for an already verified token
+        statement = statement.where(User.id == cached[0])
+        payload = None
+    else:
+        try:
+            payload = jwt.decode(token, SIGNING_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        statement = statement.where(User.email == email)
     
-    # Look up user by email
-    statement = select(User).where(User.email == email)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
     if user is None:
         raise credentials_exception
@@ -81,4 +150,7 @@ def get_current_user(
             detail="User account is disabled"
         )
     
+    if payload is not None and payload.get("exp") is not None:
+        _token_cache[token] = (user.id, float(payload["exp"]))
+    
     return user
@@ -18,8 +18,9 @@ if load_dotenv is not None:
 
 class Settings:
     def __init__(self) -> None:
-        default_db = f"sqlite:///{(BASE_DIR / 'frederick_fire.db').as_posix()}"
+        default_db = f"sqlite+aiosqlite:///{(BASE_DIR / 'frederick_fire.db').as_posix()}"
         self.DATABASE_URL: str = os.getenv("DATABASE_URL", default_db)
+        self.DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
         self.PROJECT_NAME: str = os.getenv("PROJECT_NAME", "Frederick Fire Chatbot")
         self.API_PREFIX: str = os.getenv("API_PREFIX", "/api")
         
@@ -28,12 +29,27 @@ class Settings:
         self.ALGORITHM: str = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
         
+        # Verified-token cache used by get_current_user
+        self.TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+        self.TOKEN_CACHE_MAXSIZE: int = int(os.getenv("TOKEN_CACHE_MAXSIZE", "10000"))
+        
+        # Argon2id cost (OWASP minimum: m=19 MiB, t=2, p=1); memory_cost is in KiB
+        self.ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "2"))
+        self.ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "19456"))
+        self.ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "1"))
+        # Startup calibration raises memory_cost until one hash takes ~target ms
+        self.ARGON2_CALIBRATE: bool = os.getenv("ARGON2_CALIBRATE", "true").lower() == "true"
+        self.ARGON2_TARGET_MS: int = int(os.getenv("ARGON2_TARGET_MS", "50"))
+        self.ARGON2_MAX_MEMORY_COST: int = int(os.getenv("ARGON2_MAX_MEMORY_COST", "131072"))
+        
         # Claude API
         self.ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
         self.CLAUDE_MODEL: str = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514")
         
         # Context settings for chat
         self.MAX_CONVERSATION_HISTORY: int = int(os.getenv("MAX_CONVERSATION_HISTORY", "20"))
+        self.HISTORY_CACHE_TTL_SECONDS: int = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "300"))
+        self.HISTORY_CACHE_MAXSIZE: int = int(os.getenv("HISTORY_CACHE_MAXSIZE", "1024"))
 
 
 settings = Settings()
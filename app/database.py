@@ -1,22 +1,69 @@
 # app/database.py
 
-from typing import Generator
-from sqlmodel import SQLModel, Session, create_engine
+from typing import AsyncGenerator
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
+# Plain "sqlite://" URLs (e.g. from an older .env) are routed to the async driver
+database_url = make_url(settings.DATABASE_URL)
+if database_url.drivername == "sqlite":
+    database_url = database_url.set(drivername="sqlite+aiosqlite")
+
+# SQLAlchemy keeps a pool of aiosqlite connections so SQLite's page cache stays warm
+engine = create_async_engine(
+    database_url,
     echo=False,
-    connect_args={"check_same_thread": False}  # SQLite specific
+    pool_size=settings.DB_POOL_SIZE,
 )
 
 
-def init_db() -> None:
+if database_url.get_backend_name() == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        # WAL lets readers run during writes and needs one fsync per commit
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.close()
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    # create_all skips tables that already exist, so add indexes introduced later
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+# Set once init_db has run (inherited by forked workers)
+_db_initialized = False
+
+
+async def init_db() -> None:
+    """Create tables and indexes once per process tree (under Gunicorn, in the master)"""
+    global _db_initialized
+    if _db_initialized:
+        return
     from . import models  # ensures model classes are imported
-    SQLModel.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+    _db_initialized = True
+
+
+def new_session() -> AsyncSession:
+    # expire_on_commit=False: attribute access after commit must not trigger lazy IO
+    return AsyncSession(engine, expire_on_commit=False)
 
 
-def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with new_session() as session:
         yield session
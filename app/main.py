@@ -4,6 +4,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+from .auth import calibrate_password_hasher
 from .database import init_db
 from .config import settings
 from .routers import health as health_router
@@ -14,9 +15,13 @@ from .routers import chat as chat_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    init_db()
+    await init_db()
+    if settings.ARGON2_CALIBRATE:
+        calibrate_password_hasher()
+    await chat_router.warm_claude_client()
     yield
-    # Shutdown (optional cleanup)
+    # Shutdown
+    await chat_router.close_claude_client()
 
 
 def create_application() -> FastAPI:
@@ -4,16 +4,36 @@ from datetime import datetime
 from typing import Optional, List
 
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, DateTime, Index, String, Text, func
+
+
+def _created_at_column() -> Column:
+    """Insert timestamp rendered as SQL (CURRENT_TIMESTAMP), not bound from Python"""
+    # default= covers tables created before server_default was added
+    return Column(DateTime, default=func.now(), server_default=func.now(), nullable=False)
+
+
+def _updated_at_column() -> Column:
+    """Like _created_at_column, and also refreshed by SQL on every ORM UPDATE"""
+    return Column(
+        DateTime,
+        default=func.now(),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
 
 
 class User(SQLModel, table=True):
     """User model - email is the sole identifier"""
+    # Fetch DB-generated timestamps during flush so async code never lazy-loads them
+    __mapper_args__ = {"eager_defaults": True}
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(sa_column=Column(String(255), unique=True, index=True, nullable=False))
     hashed_password: str = Field(sa_column=Column(String(255), nullable=False))
     is_active: bool = Field(default=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(sa_column=_created_at_column())
     
     # Relationships
     conversations: List["Conversation"] = Relationship(back_populates="user")
@@ -23,6 +43,7 @@ class User(SQLModel, table=True):
 class UserProfile(SQLModel, table=True):
     """Stores learned information about the user for context injection"""
     __tablename__ = "user_profile"
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", unique=True, index=True)
@@ -36,7 +57,7 @@ class UserProfile(SQLModel, table=True):
     preferences: Optional[str] = Field(default=None, sa_column=Column(Text))
     notes: Optional[str] = Field(default=None, sa_column=Column(Text))
     
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(sa_column=_updated_at_column())
     
     # Relationship
     user: Optional[User] = Relationship(back_populates="profile")
@@ -44,26 +65,37 @@ class UserProfile(SQLModel, table=True):
 
 class Conversation(SQLModel, table=True):
     """A conversation thread belonging to a user"""
+    __mapper_args__ = {"eager_defaults": True}
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     title: Optional[str] = Field(default=None, sa_column=Column(String(200)))
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(sa_column=_created_at_column())
+    updated_at: datetime = Field(sa_column=_updated_at_column())
     
     # Relationships
     user: Optional[User] = Relationship(back_populates="conversations")
-    messages: List["Message"] = Relationship(back_populates="conversation")
+    messages: List["Message"] = Relationship(
+        back_populates="conversation",
+        sa_relationship_kwargs={"order_by": "Message.id"},
+    )
 
 
 class Message(SQLModel, table=True):
     """A single message in a conversation"""
+    # Messages are ordered by id (insert order): created_at mixes client and
+    # CURRENT_TIMESTAMP values whose text forms do not sort together. This index
+    # makes history's ORDER BY id DESC LIMIT n a bounded range scan.
+    __table_args__ = (Index("ix_msg_conv_id", "conversation_id", "id"),)
+    __mapper_args__ = {"eager_defaults": True}
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    conversation_id: int = Field(foreign_key="conversation.id", index=True)
+    conversation_id: int = Field(foreign_key="conversation.id")
     
     role: str = Field(sa_column=Column(String(20)))  # "user" or "assistant"
     content: str = Field(sa_column=Column(Text))
     
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(sa_column=_created_at_column())
     
     # Relationship
     conversation: Optional[Conversation] = Relationship(back_populates="messages")
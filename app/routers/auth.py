@@ -2,9 +2,12 @@
 
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
+from ..database import engine, get_session
 from ..models import User, UserProfile
 from ..schemas.user import UserCreate, UserRead
 from ..schemas.auth import LoginRequest, Token
@@ -18,50 +21,53 @@ from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Dialect-specific INSERT that supports ON CONFLICT DO NOTHING
+upsert_insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user_in: UserCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """Register a new user with email and password"""
-    # Check email uniqueness
-    statement = select(User).where(User.email == user_in.email)
-    existing = session.exec(statement).first()
-    if existing:
+    # Hashing is CPU-bound; keep it off the event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user_in.password)
+
+    # Single round trip; the unique email index decides races atomically
+    statement = (
+        upsert_insert(User)
+        .values(email=user_in.email, hashed_password=hashed_password, is_active=True)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(User)
+    )
+    user = (await session.exec(statement)).scalars().first()
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered.",
         )
 
-    # Create user
-    user = User(
-        email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
-        is_active=True,
-    )
-    session.add(user)
-    session.commit()
-    session.refresh(user)
-    
-    # Create empty profile for user
+    # Create empty profile for user in the same transaction
     profile = UserProfile(user_id=user.id)
     session.add(profile)
-    session.commit()
+    await session.commit()
 
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     login_data: LoginRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """Login with email and password, returns JWT token"""
     statement = select(User).where(User.email == login_data.email)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
 
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await run_in_threadpool(
+        verify_password, login_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password.",
@@ -84,7 +90,7 @@ def login(
 
 
 @router.get("/me", response_model=UserRead)
-def get_current_user_info(
+async def get_current_user_info(
     current_user: User = Depends(get_current_user),
 ):
     """Get current logged-in user info"""
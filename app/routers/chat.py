@@ -1,12 +1,19 @@
 # app/routers/chat.py
 
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
 
+import anyio
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
+from ..database import get_session, new_session
 from ..models import User, Conversation, Message, UserProfile
 from ..schemas.chat import (
     MessageCreate,
@@ -21,64 +28,165 @@ from ..schemas.chat import (
 from ..auth import get_current_user
 from ..config import settings
 
-# Claude API client
+# Claude API client (keep-alive pool, HTTP/2 so concurrent calls share connections)
 try:
     import anthropic
-    claude_client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
 except ImportError:
-    claude_client = None
+    anthropic = None
+
+claude_http_client = None
+claude_client = None
+
+
+def get_claude_client():
+    """
+    Return the Claude client, creating it on first use.
+    Lazy so that with `gunicorn --preload` each worker opens its own sockets
+    after fork instead of sharing the parent's.
+    """
+    global claude_http_client, claude_client
+    if claude_client is None and anthropic is not None and settings.ANTHROPIC_API_KEY:
+        # Built via the SDK so it matches the HTTP library the installed SDK expects
+        limits_cls = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+        claude_http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=limits_cls(max_keepalive_connections=50, max_connections=100),
+            http2=True,
+        )
+        claude_client = anthropic.AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            http_client=claude_http_client,
+        )
+    return claude_client
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
-def build_system_prompt(user: User, profile: Optional[UserProfile]) -> str:
-    """Build system prompt with user context"""
-    base_prompt = """You are a helpful assistant for Frederick Fire and Safety. 
+BASE_PROMPT = """You are a helpful assistant for Frederick Fire and Safety. 
 You help customers inquire about fire extinguishers and safety equipment.
 You remember previous conversations and user preferences.
 Be friendly, helpful, and professional."""
+
+# Static block first, marked as an Anthropic prompt-cache breakpoint
+BASE_PROMPT_BLOCK = {"type": "text", "text": BASE_PROMPT, "cache_control": {"type": "ephemeral"}}
+
+
+@lru_cache(maxsize=4096)
+def _build_customer_context(
+    display_name: Optional[str],
+    company_name: Optional[str],
+    phone: Optional[str],
+    preferences: Optional[str],
+    notes: Optional[str],
+) -> str:
+    """Build the per-customer prompt section from immutable profile fields (memoized)"""
+    context_parts = []
+    if display_name:
+        context_parts.append(f"Customer name: {display_name}")
+    if company_name:
+        context_parts.append(f"Company: {company_name}")
+    if phone:
+        context_parts.append(f"Phone: {phone}")
+    if preferences:
+        context_parts.append(f"Preferences: {preferences}")
+    if notes:
+        context_parts.append(f"Notes: {notes}")
     
-    if profile:
-        context_parts = []
-        if profile.display_name:
-            context_parts.append(f"Customer name: {profile.display_name}")
-        if profile.company_name:
-            context_parts.append(f"Company: {profile.company_name}")
-        if profile.phone:
-            context_parts.append(f"Phone: {profile.phone}")
-        if profile.preferences:
-            context_parts.append(f"Preferences: {profile.preferences}")
-        if profile.notes:
-            context_parts.append(f"Notes: {profile.notes}")
-        
-        if context_parts:
-            context = "\n".join(context_parts)
-            base_prompt += f"\n\nKnown information about this customer:\n{context}"
-    
-    return base_prompt
+    if not context_parts:
+        return ""
+    context = "\n".join(context_parts)
+    return f"Known information about this customer:\n{context}"
+
+
+def build_system_prompt(user: User, profile: Optional[UserProfile]) -> List[dict]:
+    """Build system prompt blocks: cached base prompt, then user context"""
+    if not profile:
+        return [BASE_PROMPT_BLOCK]
+    # Keyed on the profile values (loaded fresh per request), so edits take effect next turn
+    context = _build_customer_context(
+        profile.display_name,
+        profile.company_name,
+        profile.phone,
+        profile.preferences,
+        profile.notes,
+    )
+    if not context:
+        return [BASE_PROMPT_BLOCK]
+    return [BASE_PROMPT_BLOCK, {"type": "text", "text": context}]
 
 
-def get_conversation_history(session: Session, conversation_id: int, limit: int = None) -> List[dict]:
-    """Get message history for Claude API format"""
+# conversation_id -> (owner, conversation created_at, newest message id,
+# message count, history in Claude format). Owner and created_at make sure an id
+# SQLite reused after a delete is never matched; the TTL only bounds memory.
+_history_cache: TTLCache = TTLCache(
+    maxsize=settings.HISTORY_CACHE_MAXSIZE,
+    ttl=settings.HISTORY_CACHE_TTL_SECONDS,
+)
+
+
+async def get_conversation_history(
+    session: AsyncSession, conversation: Conversation, limit: int = None
+) -> Tuple[tuple, List[dict]]:
+    """
+    Get message history for Claude API format, with the (newest id, count)
+    version it reflects. A cache hit costs one index-only query; messages
+    written by other workers change the version and force a re-read.
+    """
     limit = limit or settings.MAX_CONVERSATION_HISTORY
     
+    version_statement = select(func.max(Message.id), func.count()).where(
+        Message.conversation_id == conversation.id
+    )
+    version = tuple((await session.exec(version_statement)).one())
+    
+    key = (conversation.user_id, conversation.created_at, *version)
+    cached = _history_cache.get(conversation.id)
+    if cached is not None and cached[:4] == key and limit <= settings.MAX_CONVERSATION_HISTORY:
+        return version, cached[4][-limit:]
+    
     statement = (
         select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.desc())
+        .where(Message.conversation_id == conversation.id)
+        .order_by(Message.id.desc())
         .limit(limit)
     )
-    messages = session.exec(statement).all()
+    messages = (await session.exec(statement)).all()
     
     # Reverse to chronological order and format for Claude
-    return [
+    history = [
         {"role": msg.role, "content": msg.content}
         for msg in reversed(messages)
     ]
+    if limit == settings.MAX_CONVERSATION_HISTORY:
+        _history_cache[conversation.id] = (*key, history)
+    return version, history
+
+
+def remember_turn(
+    conversation: Conversation,
+    version: tuple,
+    history: List[dict],
+    user_message: Message,
+    assistant_message: Message,
+) -> None:
+    """
+    Write a just-committed turn through to the history cache.
+    The entry claims exactly two messages more than `version`; if a racing
+    turn also wrote, the next probe's count disagrees and history is re-read.
+    """
+    _, count = version
+    turn = [
+        {"role": user_message.role, "content": user_message.content},
+        {"role": assistant_message.role, "content": assistant_message.content},
+    ]
+    updated = (history + turn)[-settings.MAX_CONVERSATION_HISTORY:]
+    _history_cache[conversation.id] = (
+        conversation.user_id, conversation.created_at, assistant_message.id, count + 2, updated
+    )
 
 
-def call_claude(system_prompt: str, messages: List[dict], new_message: str) -> str:
+async def call_claude(system_prompt: List[dict], messages: List[dict], new_message: str) -> str:
     """Call Claude API and return response"""
+    claude_client = get_claude_client()
     if not claude_client:
         # Fallback for testing without API key
         return f"[Demo mode - Claude API not configured] I received your message: '{new_message}'. To enable real responses, set your ANTHROPIC_API_KEY."
@@ -87,7 +195,7 @@ def call_claude(system_prompt: str, messages: List[dict], new_message: str) -> s
     full_messages = messages + [{"role": "user", "content": new_message}]
     
     try:
-        response = claude_client.messages.create(
+        response = await claude_client.messages.create(
             model=settings.CLAUDE_MODEL,
             max_tokens=1024,
             system=system_prompt,
@@ -98,27 +206,90 @@ def call_claude(system_prompt: str, messages: List[dict], new_message: str) -> s
         return f"I apologize, but I encountered an error: {str(e)}. Please try again."
 
 
+async def stream_claude(system_prompt: List[dict], messages: List[dict], new_message: str) -> AsyncIterator[str]:
+    """Stream Claude's response as text chunks"""
+    claude_client = get_claude_client()
+    if not claude_client:
+        # Fallback for testing without API key
+        yield f"[Demo mode - Claude API not configured] I received your message: '{new_message}'. To enable real responses, set your ANTHROPIC_API_KEY."
+        return
+    
+    # Add the new user message to history
+    full_messages = messages + [{"role": "user", "content": new_message}]
+    
+    try:
+        async with claude_client.messages.stream(
+            model=settings.CLAUDE_MODEL,
+            max_tokens=1024,
+            system=system_prompt,
+            messages=full_messages
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+    except Exception as e:
+        yield f"I apologize, but I encountered an error: {str(e)}. Please try again."
+
+
+def utc_now() -> datetime:
+    """Naive UTC datetime, the same timezone CURRENT_TIMESTAMP uses"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def format_sse(data: str, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events frame (multi-line data is split per the spec)"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def warm_claude_client() -> None:
+    """Open a pooled connection (DNS + TCP + TLS) to the Claude API ahead of the first chat"""
+    try:
+        claude_client = get_claude_client()
+        if not claude_client:
+            return
+        # Any response will do; the point is the established connection
+        await claude_http_client.get(str(claude_client.base_url), timeout=5.0)
+    except Exception:
+        pass  # Best effort - the first real request will connect instead
+
+
+async def close_claude_client() -> None:
+    """Release pooled Claude API connections; a later lifespan builds a new client"""
+    global claude_http_client, claude_client
+    if claude_client:
+        await claude_client.close()
+    claude_client = None
+    claude_http_client = None
+
+
 # --- Conversation Endpoints ---
 
 @router.get("/conversations", response_model=List[ConversationRead])
-def list_conversations(
-    session: Session = Depends(get_session),
+async def list_conversations(
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """List all conversations for the current user"""
+    # Column projection: plain rows, no ORM instances or identity-map bookkeeping
     statement = (
-        select(Conversation)
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+        )
         .where(Conversation.user_id == current_user.id)
-        .order_by(Conversation.updated_at.desc())
+        .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
     )
-    conversations = session.exec(statement).all()
-    return conversations
+    rows = (await session.exec(statement)).all()
+    return rows
 
 
 @router.post("/conversations", response_model=ConversationRead, status_code=status.HTTP_201_CREATED)
-def create_conversation(
+async def create_conversation(
     conv_in: ConversationCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Create a new conversation"""
@@ -127,23 +298,27 @@ def create_conversation(
         title=conv_in.title or "New Conversation",
     )
     session.add(conversation)
-    session.commit()
-    session.refresh(conversation)
+    await session.commit()
+    await session.refresh(conversation)
     return conversation
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
-def get_conversation(
+async def get_conversation(
     conversation_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Get a conversation with all messages"""
-    statement = select(Conversation).where(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
+    statement = (
+        select(Conversation)
+        .options(selectinload(Conversation.messages))
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )
     )
-    conversation = session.exec(statement).first()
+    conversation = (await session.exec(statement)).first()
     
     if not conversation:
         raise HTTPException(
@@ -151,27 +326,15 @@ def get_conversation(
             detail="Conversation not found"
         )
     
-    # Get messages
-    msg_statement = (
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.asc())
-    )
-    messages = session.exec(msg_statement).all()
-    
-    return ConversationDetail(
-        id=conversation.id,
-        title=conversation.title,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        messages=[MessageRead.model_validate(m) for m in messages]
-    )
+    # response_model validates the ORM object (messages included) in a single
+    # pydantic-core call; building ConversationDetail here would be validated twice
+    return conversation
 
 
 @router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Delete a conversation and all its messages"""
@@ -179,7 +342,7 @@ def delete_conversation(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
     )
-    conversation = session.exec(statement).first()
+    conversation = (await session.exec(statement)).first()
     
     if not conversation:
         raise HTTPException(
@@ -187,23 +350,20 @@ def delete_conversation(
             detail="Conversation not found"
         )
     
-    # Delete messages first
-    msg_statement = select(Message).where(Message.conversation_id == conversation_id)
-    messages = session.exec(msg_statement).all()
-    for msg in messages:
-        session.delete(msg)
-    
-    session.delete(conversation)
-    session.commit()
+    # Bulk-delete messages, then the conversation itself (no per-row loads)
+    await session.exec(delete(Message).where(Message.conversation_id == conversation_id))
+    await session.exec(delete(Conversation).where(Conversation.id == conversation_id))
+    await session.commit()
+    _history_cache.pop(conversation_id, None)
 
 
 # --- Chat Endpoint ---
 
 @router.post("/conversations/{conversation_id}/messages", response_model=ChatResponse)
-def send_message(
+async def send_message(
     conversation_id: int,
     message_in: MessageCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Send a message and get a response from the chatbot"""
@@ -212,7 +372,7 @@ def send_message(
         Conversation.id == conversation_id,
         Conversation.user_id == current_user.id
     )
-    conversation = session.exec(conv_statement).first()
+    conversation = (await session.exec(conv_statement)).first()
     
     if not conversation:
         raise HTTPException(
@@ -220,43 +380,34 @@ def send_message(
             detail="Conversation not found"
         )
     
-    # Get user profile for context
-    profile_statement = select(UserProfile).where(UserProfile.user_id == current_user.id)
-    profile = session.exec(profile_statement).first()
-    
-    # Build system prompt with user context
-    system_prompt = build_system_prompt(current_user, profile)
+    # Build system prompt with user context (profile is loaded by get_current_user)
+    system_prompt = build_system_prompt(current_user, current_user.profile)
     
     # Get conversation history
-    history = get_conversation_history(session, conversation_id)
+    version, history = await get_conversation_history(session, conversation)
     
-    # Save user message
+    # Build user message now, stamped with the send time; it is written with the reply below
     user_message = Message(
         conversation_id=conversation_id,
         role="user",
-        content=message_in.content
+        content=message_in.content,
+        created_at=utc_now()
     )
-    session.add(user_message)
-    session.commit()
-    session.refresh(user_message)
     
-    # Get response from Claude
-    assistant_response = call_claude(system_prompt, history, message_in.content)
+    # Get response from Claude (no write transaction is held open meanwhile)
+    assistant_response = await call_claude(system_prompt, history, message_in.content)
     
-    # Save assistant message
     assistant_message = Message(
         conversation_id=conversation_id,
         role="assistant",
         content=assistant_response
     )
-    session.add(assistant_message)
-    
-    # Update conversation timestamp
-    conversation.updated_at = datetime.utcnow()
-    session.add(conversation)
     
-    session.commit()
-    session.refresh(assistant_message)
+    # Save both messages and the conversation timestamp in one transaction
+    conversation.updated_at = func.now()
+    session.add_all([user_message, assistant_message, conversation])
+    await session.commit()
+    remember_turn(conversation, version, history, user_message, assistant_message)
     
     return ChatResponse(
         conversation_id=conversation_id,
@@ -265,13 +416,104 @@ def send_message(
     )
 
 
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def send_message_stream(
+    conversation_id: int,
+    message_in: MessageCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Send a message and stream the chatbot's reply as Server-Sent Events.
+    Text chunks arrive as unnamed events; a final "done" event carries the
+    ChatResponse with both persisted messages.
+    """
+    # Verify conversation belongs to user
+    conv_statement = select(Conversation).where(
+        Conversation.id == conversation_id,
+        Conversation.user_id == current_user.id
+    )
+    conversation = (await session.exec(conv_statement)).first()
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    # Build system prompt with user context (profile is loaded by get_current_user)
+    system_prompt = build_system_prompt(current_user, current_user.profile)
+    
+    # Get conversation history
+    version, history = await get_conversation_history(session, conversation)
+    
+    # Build user message now, stamped with the send time; it is written with the reply
+    user_message = Message(
+        conversation_id=conversation_id,
+        role="user",
+        content=message_in.content,
+        created_at=utc_now()
+    )
+    
+    async def save_turn(reply: str) -> Message:
+        # The request-scoped session is closed once streaming starts, so use a fresh one
+        async with new_session() as stream_session:
+            assistant_message = Message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content=reply
+            )
+            stream_session.add_all([user_message, assistant_message])
+            await stream_session.exec(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(updated_at=func.now())
+            )
+            await stream_session.commit()
+            remember_turn(conversation, version, history, user_message, assistant_message)
+            return assistant_message
+    
+    async def event_stream() -> AsyncIterator[str]:
+        chunks: List[str] = []
+        assistant_message = None
+        try:
+            async for text in stream_claude(system_prompt, history, message_in.content):
+                chunks.append(text)
+                yield format_sse(text)
+        finally:
+            reply = "".join(chunks)
+            # Nothing streamed (e.g. disconnect before the first token): skip the turn,
+            # since an empty assistant message would be rejected in later history.
+            # Shielded so a client disconnect still saves a partial reply.
+            if reply:
+                with anyio.CancelScope(shield=True):
+                    assistant_message = await save_turn(reply)
+        
+        if assistant_message is None:
+            yield format_sse("No reply was generated. Please try again.", event="error")
+            return
+        
+        response = ChatResponse(
+            conversation_id=conversation_id,
+            user_message=MessageRead.model_validate(user_message),
+            assistant_message=MessageRead.model_validate(assistant_message)
+        )
+        yield format_sse(response.model_dump_json(), event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # --- Quick Chat Endpoint (creates conversation if needed) ---
 
 @router.post("/message", response_model=ChatResponse)
-def quick_message(
+async def quick_message(
     message_in: MessageCreate,
     conversation_id: Optional[int] = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Send a message, optionally creating a new conversation"""
@@ -281,7 +523,7 @@ def quick_message(
             Conversation.id == conversation_id,
             Conversation.user_id == current_user.id
         )
-        conversation = session.exec(conv_statement).first()
+        conversation = (await session.exec(conv_statement)).first()
         if not conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -296,43 +538,43 @@ def quick_message(
             title=title
         )
         session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        await session.commit()
+        await session.refresh(conversation)
     
     # Now send the message using the conversation
-    return send_message(conversation.id, message_in, session, current_user)
+    return await send_message(conversation.id, message_in, session, current_user)
 
 
 # --- User Profile Endpoints ---
 
 @router.get("/profile", response_model=UserProfileRead)
-def get_profile(
-    session: Session = Depends(get_session),
+async def get_profile(
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Get current user's profile"""
     statement = select(UserProfile).where(UserProfile.user_id == current_user.id)
-    profile = session.exec(statement).first()
+    profile = (await session.exec(statement)).first()
     
     if not profile:
         # Create profile if doesn't exist
         profile = UserProfile(user_id=current_user.id)
         session.add(profile)
-        session.commit()
-        session.refresh(profile)
+        await session.commit()
+        await session.refresh(profile)
     
     return profile
 
 
 @router.patch("/profile", response_model=UserProfileRead)
-def update_profile(
+async def update_profile(
     profile_in: UserProfileUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Update current user's profile"""
     statement = select(UserProfile).where(UserProfile.user_id == current_user.id)
-    profile = session.exec(statement).first()
+    profile = (await session.exec(statement)).first()
     
     if not profile:
         profile = UserProfile(user_id=current_user.id)
@@ -342,9 +584,9 @@ def update_profile(
     for key, value in update_data.items():
         setattr(profile, key, value)
     
-    profile.updated_at = datetime.utcnow()
+    profile.updated_at = func.now()
     session.add(profile)
-    session.commit()
-    session.refresh(profile)
+    await session.commit()
+    await session.refresh(profile)
     
     return profile
@@ -6,5 +6,5 @@ router = APIRouter(prefix="/health", tags=["Health"])
 
 
 @router.get("/", summary="Health check")
-def health_check():
+async def health_check():
     return {"status": "ok"}
@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+"""
+Production server settings: gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Async workers for the I/O-bound Claude calls; several processes so the
+# CPU-bound password hashing is not limited to one core
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
+
+# Import the app once in the master so workers share its pages copy-on-write
+preload_app = True
+
+
+def on_starting(server):
+    # One-time startup work runs here in the master: workers racing CREATE TABLE
+    # can fail to boot, and parallel Argon2 calibration measures contention.
+    # Each worker's lifespan then sees both done and keeps the inherited state.
+    import asyncio
+
+    from app.auth import calibrate_password_hasher
+    from app.config import settings
+    from app.database import engine, init_db
+
+    async def create_schema():
+        await init_db()
+        await engine.dispose()  # connections are bound to this short-lived loop
+
+    asyncio.run(create_schema())
+    if settings.ARGON2_CALIBRATE:
+        calibrate_password_hasher()
+
+
+def post_fork(server, worker):
+    # Never reuse database connections inherited from the master
+    from app.database import engine
+    engine.sync_engine.dispose(close=False)